@@ -16,6 +16,11 @@ from sklearn.cluster import KMeans
 import colorsys
 import time
 import uuid
+import re
+import asyncio
+from contextlib import asynccontextmanager
+from media_index import MediaIndex
+from recolour import recolour_image
 
 # Configure logger to show timestamps
 logger.remove()
@@ -23,7 +28,18 @@ logger.add(lambda msg: print(msg, flush=True), format="<green>{time:YYYY-MM-DD H
 
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the media janitor for the lifetime of the app."""
+    janitor = asyncio.create_task(run_media_janitor())
+    yield
+    janitor.cancel()
+    try:
+        await janitor
+    except asyncio.CancelledError:
+        pass
+
+app = FastAPI(lifespan=lifespan)
 
 # Get the directory where main.py is located
 BASE_DIR = Path(__file__).parent
@@ -75,6 +91,18 @@ SEGMENTATION_CONFIG = {
     "min_mask_region_area": 100,
     "min_relative_area": 0.01  # Minimum segment area relative to image
 }
+MEDIA_CONFIG = {
+    "janitor_interval_seconds": 300,
+    # Per-category limits; None disables that rule. Uploads belong to the API and
+    # unrecognised files (e.g. the API's SQLite database) are never evicted.
+    "max_age_hours": {"debug": 24, "recolour": 24 * 7, "upload": None},
+    "max_total_bytes": {"debug": 1 << 30, "recolour": 5 << 30, "upload": None}
+}
+media_index = MediaIndex(
+    MEDIA_PATH,
+    max_age_hours=MEDIA_CONFIG["max_age_hours"],
+    max_total_bytes=MEDIA_CONFIG["max_total_bytes"]
+)
 
 class Point(BaseModel):
     x: float = Field(..., ge=0.0, le=1.0)  # Normalized 0-1
@@ -97,10 +125,32 @@ class SegmentationResponse(BaseModel):
     dominant_colors: List[str]
     debug_image_path: str = ""
 
+class RecolourRequest(BaseModel):
+    file_path: str
+    segments: List[Segment]  # Segments as returned by /segment
+    colors: Dict[int, str]  # Segment id -> target hex color
+    quality: str = Field("preview", pattern="^(preview|hi)$")
+
+    @validator('colors')
+    def validate_colors(cls, v):
+        for segment_id, hex_color in v.items():
+            if not re.fullmatch("#[0-9a-fA-F]{6}", hex_color):
+                raise ValueError(f"Invalid hex color for segment {segment_id}: {hex_color}")
+        return v
+
+class RecolourResponse(BaseModel):
+    message: str
+    quality: str
+    output_path: str
+
 class HealthCheck(BaseModel):
     status: str = "OK"
     media_path_exists: bool
 
+class MediaStats(BaseModel):
+    categories: Dict[str, Dict[str, int]]  # Category -> {"count", "bytes"}
+    total_bytes: int
+
 def rgb_to_hex(rgb):
     """Convert RGB tuple to hex color code."""
     return '#{:02x}{:02x}{:02x}'.format(int(rgb[0]), int(rgb[1]), int(rgb[2]))
@@ -197,16 +247,6 @@ def get_unique_path(base_path: Path, suffix: str) -> Path:
     unique_id = str(uuid.uuid4())[:8]
     return parent / f"{stem}_{unique_id}{suffix}"
 
-def cleanup_old_files(directory: Path, pattern: str, max_age_hours: int = 24) -> None:
-    """Clean up old debug files."""
-    try:
-        current_time = time.time()
-        for file in directory.glob(pattern):
-            if (current_time - file.stat().st_mtime) > max_age_hours * 3600:
-                file.unlink()
-    except Exception as e:
-        logger.warning(f"Failed to cleanup old files: {e}")
-
 def find_contours(image: np.ndarray) -> List[Dict]:
     """Find segments in the image using SAM's Automatic Mask Generator."""
     try:
@@ -298,20 +338,35 @@ def find_contours(image: np.ndarray) -> List[Dict]:
         # Cleanup to help with memory
         torch.cuda.empty_cache() if torch.cuda.is_available() else None
 
+async def run_media_janitor() -> None:
+    """Periodically refresh the media index and evict expired or over-quota artefacts."""
+    while True:
+        try:
+            await asyncio.to_thread(media_index.refresh)
+            await asyncio.to_thread(media_index.evict)
+        except Exception as e:
+            logger.warning(f"Media janitor run failed: {e}")
+        await asyncio.sleep(MEDIA_CONFIG["janitor_interval_seconds"])
+
 @app.get("/")
 def read_root() -> HealthCheck:
     """Health check endpoint."""
-    media_path = Path(os.getenv("MEDIA_PATH", str(BASE_DIR / "media"))).resolve()
-    logger.info("Using media path: {}", media_path)
-    path_exists = os.path.exists(media_path)
+    path_exists = MEDIA_PATH.exists()
     
     if not path_exists:
-        logger.warning(f"Media path not found: {media_path}")
-    else:
-        logger.info("Media path exists and contains: {}", os.listdir(media_path))
+        logger.warning(f"Media path not found: {MEDIA_PATH}")
     
     return HealthCheck(media_path_exists=path_exists)
 
+@app.get("/media/stats")
+def media_stats() -> MediaStats:
+    """Media usage per artefact category, served from the index."""
+    categories = media_index.stats()
+    return MediaStats(
+        categories=categories,
+        total_bytes=sum(c["bytes"] for c in categories.values())
+    )
+
 @app.get("/test")
 async def test_segmentation():
     """Test endpoint using block-colors-01.jpg."""
@@ -377,9 +432,7 @@ async def segment_image(file_path: str):
             '.jpg'
         )
         create_debug_visualization(image, segments, debug_path)
-        
-        # Cleanup old debug files
-        cleanup_old_files(debug_path.parent, "*.debug.jpg")
+        media_index.add(debug_path)
         
         # Create response
         response = SegmentationResponse(
@@ -398,6 +451,46 @@ async def segment_image(file_path: str):
         logger.error(f"Segmentation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/recolour")
+async def recolour(request: RecolourRequest):
+    """Recolour segments of an uploaded image (quality=hi for zoom/export renders)."""
+    try:
+        file_path = MEDIA_PATH / Path(request.file_path).name
+        if not file_path.exists():
+            raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
+
+        image = cv2.imread(str(file_path))
+        validate_image(image)
+
+        logger.info(f"Recolouring image: {file_path} (quality={request.quality})")
+        start_time = time.time()
+        segments = [segment.dict() for segment in request.segments]
+        recoloured = sum(1 for segment in segments if segment["id"] in request.colors)
+        result = await asyncio.to_thread(recolour_image, image, segments, request.colors, request.quality)
+        logger.info(f"Recolour finished in {time.time() - start_time:.2f} seconds")
+
+        # Lossless output for high-quality exports
+        suffix = '.png' if request.quality == "hi" else '.jpg'
+        output_path = get_unique_path(
+            file_path.with_suffix(f'.recolour.{request.quality}{suffix}'),
+            suffix
+        )
+        await asyncio.to_thread(cv2.imwrite, str(output_path), result)
+        media_index.add(output_path)
+
+        response = RecolourResponse(
+            message=f"Successfully recoloured {recoloured} segments",
+            quality=request.quality,
+            output_path=str(output_path)
+        )
+        return response.dict()
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Recolour failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("CV Service: Starting server...")
@@ -0,0 +1,203 @@
+import os
+import time
+import threading
+from fnmatch import fnmatch
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+# First matching pattern decides an artefact's category; unmatched files are "other"
+MEDIA_CATEGORIES = [
+    ("debug", "*.debug*.jpg"),
+    ("recolour", "*.recolour.*"),
+    ("upload", "rugImage-*"),
+]
+# Categories written by other services, which may change in place
+RESTAT_CATEGORIES = ("upload", "other")
+
+@dataclass
+class MediaEntry:
+    path: Path
+    category: str
+    size: int
+    mtime: float
+
+def classify(name: str) -> str:
+    """Return the artefact category for a media file name."""
+    for category, pattern in MEDIA_CATEGORIES:
+        if fnmatch(name, pattern):
+            return category
+    return "other"
+
+def _track(entries: Dict[str, MediaEntry], totals: Dict[str, List[int]], entry: MediaEntry) -> None:
+    old = entries.get(entry.path.name)
+    if old is not None:
+        _untrack(entries, totals, old)
+    entries[entry.path.name] = entry
+    category_totals = totals.setdefault(entry.category, [0, 0])
+    category_totals[0] += 1
+    category_totals[1] += entry.size
+
+def _untrack(entries: Dict[str, MediaEntry], totals: Dict[str, List[int]], entry: MediaEntry) -> None:
+    del entries[entry.path.name]
+    category_totals = totals[entry.category]
+    category_totals[0] -= 1
+    category_totals[1] -= entry.size
+
+class MediaIndex:
+    """In-memory index of the media directory with per-category usage totals.
+
+    Request handlers register files they write with add(); files written, removed or
+    resized by other services (uploads) are picked up by refresh(). The lock is only
+    held for snapshots and O(changed files) updates, so request latency does not depend
+    on how many files the directory holds.
+    """
+
+    def __init__(self, root: Path, max_age_hours: Dict[str, Optional[float]],
+                 max_total_bytes: Dict[str, Optional[int]]):
+        self.root = root
+        self.max_age_hours = max_age_hours
+        self.max_total_bytes = max_total_bytes
+        self._entries: Dict[str, MediaEntry] = {}
+        self._totals: Dict[str, List[int]] = {}  # category -> [count, bytes]
+        self._added: Dict[str, MediaEntry] = {}  # add() calls since the current rescan started
+        self._dir_mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def add(self, path: Path) -> None:
+        """Register a file written into the media directory."""
+        try:
+            st = path.stat()
+        except OSError as e:
+            logger.warning(f"Failed to index media file {path}: {e}")
+            return
+        entry = MediaEntry(path, classify(path.name), st.st_size, st.st_mtime)
+        with self._lock:
+            _track(self._entries, self._totals, entry)
+            self._added[path.name] = entry
+
+    def refresh(self) -> None:
+        """Bring the index in line with files changed behind its back.
+
+        When the directory mtime has changed, the listing is diffed against the index by
+        name: only new files are stat-ed and vanished ones dropped. Files other services
+        write (uploads, the API's database) can also change in place without touching the
+        directory mtime, so those entries are re-stat-ed on every call.
+        """
+        try:
+            dir_mtime_ns = os.stat(self.root).st_mtime_ns
+        except OSError as e:
+            logger.warning(f"Failed to stat media path {self.root}: {e}")
+            return
+        if dir_mtime_ns != self._dir_mtime_ns:
+            self._sync_listing(dir_mtime_ns)
+        self._restat(RESTAT_CATEGORIES)
+
+    def _sync_listing(self, dir_mtime_ns: int) -> None:
+        with self._lock:
+            self._added = {}
+        with os.scandir(self.root) as it:
+            listing = {dir_entry.name: dir_entry for dir_entry in it if dir_entry.is_file()}
+        with self._lock:
+            known = list(self._entries)
+
+        gone = [name for name in known if name not in listing]
+        known = set(known)
+        new_entries = []
+        for name, dir_entry in listing.items():
+            if name in known:
+                continue
+            try:
+                st = dir_entry.stat()
+            except OSError:
+                continue  # Removed while scanning
+            path = Path(dir_entry.path)
+            new_entries.append(MediaEntry(path, classify(name), st.st_size, st.st_mtime))
+
+        with self._lock:
+            for name in gone:
+                # Files registered after the listing was taken are not really gone
+                if name in self._entries and name not in self._added:
+                    _untrack(self._entries, self._totals, self._entries[name])
+            for entry in new_entries:
+                if entry.path.name not in self._entries:
+                    _track(self._entries, self._totals, entry)
+            self._dir_mtime_ns = dir_mtime_ns
+        if gone or new_entries:
+            logger.info(f"Indexed {len(new_entries)} new media files, dropped {len(gone)}")
+
+    def _restat(self, categories: Tuple[str, ...]) -> None:
+        with self._lock:
+            snapshot = list(self._entries.values())
+        changed = []
+        for entry in snapshot:
+            if entry.category not in categories:
+                continue
+            try:
+                st = entry.path.stat()
+            except OSError:
+                continue  # Dropped by the next listing sync
+            if st.st_size != entry.size or st.st_mtime != entry.mtime:
+                changed.append((entry, MediaEntry(entry.path, entry.category, st.st_size, st.st_mtime)))
+        with self._lock:
+            for old, new in changed:
+                if self._entries.get(old.path.name) is old:
+                    _track(self._entries, self._totals, new)
+
+    def evict(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """Delete expired artefacts, then the oldest ones over each category's quota.
+
+        Only categories with a configured limit are touched. Returns (files, bytes) removed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            snapshot = list(self._entries.values())
+            category_bytes = {category: size for category, (_, size) in self._totals.items()}
+
+        by_category: Dict[str, List[MediaEntry]] = {}
+        for entry in snapshot:
+            by_category.setdefault(entry.category, []).append(entry)
+
+        candidates = []
+        for category, entries in by_category.items():
+            max_age = self.max_age_hours.get(category)
+            quota = self.max_total_bytes.get(category)
+            if max_age is None and quota is None:
+                continue
+            entries.sort(key=lambda e: e.mtime)
+            remaining = category_bytes[category]
+            for entry in entries:
+                expired = max_age is not None and now - entry.mtime > max_age * 3600
+                over_quota = quota is not None and remaining > quota
+                if not (expired or over_quota):
+                    break  # Sorted oldest first, so nothing later qualifies either
+                candidates.append(entry)
+                remaining -= entry.size
+
+        victims = []
+        with self._lock:
+            for entry in candidates:
+                # Skip files re-registered since the snapshot was taken
+                if self._entries.get(entry.path.name) is entry:
+                    _untrack(self._entries, self._totals, entry)
+                    victims.append(entry)
+
+        removed_bytes = 0
+        for entry in victims:
+            try:
+                entry.path.unlink(missing_ok=True)
+                removed_bytes += entry.size
+            except OSError as e:
+                logger.warning(f"Failed to remove media file {entry.path}: {e}")
+        if victims:
+            logger.info(f"Evicted {len(victims)} media files ({removed_bytes} bytes)")
+        return len(victims), removed_bytes
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return file count and total bytes per category."""
+        with self._lock:
+            return {
+                category: {"count": count, "bytes": size}
+                for category, (count, size) in self._totals.items()
+            }
@@ -0,0 +1,127 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import numpy as np
+import cv2
+
+RECOLOUR_CONFIG = {
+    "pyramid_levels": 4,    # Coarsest band is 1/16 scale; sets the width of the boundary blend
+    "tile_size": 512,       # Core tile edge in pixels
+    "tile_overlap": 64,     # Must cover the pyramid's filter support
+    "max_workers": os.cpu_count() or 1
+}
+# Every pyramid level must halve the padded tile exactly
+assert (RECOLOUR_CONFIG["tile_size"] + 2 * RECOLOUR_CONFIG["tile_overlap"]) % (1 << RECOLOUR_CONFIG["pyramid_levels"]) == 0, \
+    "tile_size + 2 * tile_overlap must be divisible by 2 ** pyramid_levels"
+
+# Long-lived pool so each worker keeps its float32 tile buffers between requests
+recolour_executor = ThreadPoolExecutor(
+    max_workers=RECOLOUR_CONFIG["max_workers"],
+    thread_name_prefix="recolour"
+)
+_tile_buffers = threading.local()
+
+def hex_to_lab(hex_color: str) -> np.ndarray:
+    """Convert hex color code to a float32 LAB triple."""
+    rgb = [int(hex_color[i:i+2], 16) for i in (1, 3, 5)]
+    bgr = np.array([[rgb[::-1]]], dtype=np.float32) / 255.0
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB)[0, 0]
+
+def build_label_map(segments: List[Dict], shape) -> np.ndarray:
+    """Rasterise segment polygons into a label map (0 = background, i + 1 = segments[i])."""
+    h, w = shape[:2]
+    labels = np.zeros((h, w), dtype=np.int32)
+    # Segments arrive largest first, so smaller segments are painted on top
+    for i, segment in enumerate(segments):
+        if len(segment["mask"]) < 3:
+            continue  # Degenerate polygon covers no area
+        points = np.array(
+            [[int(point["x"] * w), int(point["y"] * h)] for point in segment["mask"]],
+            dtype=np.int32
+        )
+        cv2.fillPoly(labels, [points], i + 1)
+    return labels
+
+def _get_tile_buffers(size: int, levels: int) -> Dict:
+    """Return this worker thread's float32 tile buffers, allocating them on first use."""
+    buffers = getattr(_tile_buffers, "buffers", None)
+    if buffers is None or buffers["key"] != (size, levels):
+        buffers = {
+            "key": (size, levels),
+            "bgr": np.empty((size, size, 3), dtype=np.float32),
+            "lab": np.empty((size, size, 3), dtype=np.float32),
+            "pyramid": [np.empty((size >> l, size >> l, 3), dtype=np.float32) for l in range(levels + 1)]
+        }
+        _tile_buffers.buffers = buffers
+    return buffers
+
+def _recolour_tile(padded_image: np.ndarray, padded_labels: np.ndarray, offsets: np.ndarray,
+                   output: np.ndarray, y: int, x: int, tile_size: int, overlap: int, levels: int) -> None:
+    """Recolour one overlapping tile and write its core into the output image."""
+    size = tile_size + 2 * overlap
+    buffers = _get_tile_buffers(size, levels)
+    bgr, lab, pyramid = buffers["bgr"], buffers["lab"], buffers["pyramid"]
+
+    # Per-pixel LAB offset of the segment the pixel belongs to
+    np.take(offsets, padded_labels[y:y+size, x:x+size], axis=0, out=pyramid[0])
+
+    # Each segment's recolour is a constant LAB offset, so its Laplacian bands match the
+    # source tile everywhere but the coarsest level. The multi-band blend across segment
+    # boundaries therefore reduces to blending the offsets at that level and expanding back.
+    for l in range(levels):
+        cv2.pyrDown(pyramid[l], dst=pyramid[l + 1])
+    for l in reversed(range(levels)):
+        cv2.pyrUp(pyramid[l + 1], dst=pyramid[l])
+
+    bgr[...] = padded_image[y:y+size, x:x+size]
+    bgr *= 1.0 / 255.0
+    cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB, dst=lab)
+    cv2.add(lab, pyramid[0], dst=lab)
+    cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=bgr)
+
+    h, w = output.shape[:2]
+    core = bgr[overlap:overlap + min(tile_size, h - y), overlap:overlap + min(tile_size, w - x)]
+    np.clip(core, 0.0, 1.0, out=core)
+    core *= 255.0
+    core += 0.5
+    output[y:y+core.shape[0], x:x+core.shape[1]] = core
+
+def recolour_image(image: np.ndarray, segments: List[Dict], colors: Dict[int, str], quality: str = "preview") -> np.ndarray:
+    """Shift each segment's colour towards its target in LAB space, preserving texture.
+
+    quality="hi" blends across segment boundaries with a Laplacian pyramid; the image is
+    split into overlapping tiles that are processed in parallel on the recolour pool.
+    """
+    h, w = image.shape[:2]
+    levels = RECOLOUR_CONFIG["pyramid_levels"] if quality == "hi" else 0
+    overlap = RECOLOUR_CONFIG["tile_overlap"] if levels else 0
+    tile_size = RECOLOUR_CONFIG["tile_size"]
+
+    labels = build_label_map(segments, image.shape)
+
+    # LAB offset per label; background and segments without a target colour stay unchanged
+    offsets = np.zeros((len(segments) + 1, 3), dtype=np.float32)
+    for i, segment in enumerate(segments):
+        target = colors.get(segment["id"])
+        if target is not None:
+            offsets[i + 1] = hex_to_lab(target) - hex_to_lab(segment["color"])
+
+    # Pad so every tile, including those on the right/bottom edges, has the same size
+    pad_bottom = overlap + (-h) % tile_size
+    pad_right = overlap + (-w) % tile_size
+    padded_image = cv2.copyMakeBorder(image, overlap, pad_bottom, overlap, pad_right, cv2.BORDER_REFLECT_101)
+    padded_labels = cv2.copyMakeBorder(labels, overlap, pad_bottom, overlap, pad_right, cv2.BORDER_REFLECT_101)
+
+    output = np.empty_like(image)
+    futures = [
+        recolour_executor.submit(
+            _recolour_tile, padded_image, padded_labels, offsets, output,
+            y, x, tile_size, overlap, levels
+        )
+        for y in range(0, h, tile_size)
+        for x in range(0, w, tile_size)
+    ]
+    for future in futures:
+        future.result()
+    return output
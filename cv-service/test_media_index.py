@@ -0,0 +1,126 @@
+import os
+import time
+import pytest
+from loguru import logger
+from media_index import MediaIndex, classify
+
+NOW = time.time()
+
+def make_file(directory, name, size, age_hours):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    mtime = NOW - age_hours * 3600
+    os.utime(path, (mtime, mtime))
+    return path
+
+def bump_dir_mtime(directory):
+    os.utime(directory, ns=(0, os.stat(directory).st_mtime_ns + 1))
+
+@pytest.fixture
+def index(tmp_path):
+    return MediaIndex(
+        tmp_path,
+        max_age_hours={"debug": 24, "recolour": None, "upload": None},
+        max_total_bytes={"debug": None, "recolour": 100, "upload": None}
+    )
+
+@pytest.mark.parametrize("name, category", [
+    ("rugImage-x.debug.jpg", "debug"),
+    ("rugImage-x.debug_ab12cd34.jpg", "debug"),
+    ("rugImage-x.recolour.hi.png", "recolour"),
+    ("rugImage-x.recolour.preview_ab12cd34.jpg", "recolour"),
+    ("rugImage-x.jpg", "upload"),
+    ("database.sqlite", "other"),
+])
+def test_classify(name, category):
+    assert classify(name) == category
+
+def test_evicts_expired_files(tmp_path, index):
+    old = make_file(tmp_path, "a.debug.jpg", 10, 30)
+    fresh = make_file(tmp_path, "b.debug.jpg", 10, 1)
+    index.refresh()
+    assert index.evict(NOW) == (1, 10)
+    assert not old.exists()
+    assert fresh.exists()
+
+def test_evicts_oldest_over_quota(tmp_path, index):
+    oldest = make_file(tmp_path, "a.recolour.hi.png", 50, 3)
+    older = make_file(tmp_path, "b.recolour.hi.png", 50, 2)
+    newest = make_file(tmp_path, "c.recolour.hi.png", 50, 1)
+    index.refresh()
+    assert index.evict(NOW) == (1, 50)
+    assert not oldest.exists()
+    assert older.exists() and newest.exists()
+
+def test_never_evicts_uploads_or_other(tmp_path, index):
+    upload = make_file(tmp_path, "rugImage-1.png", 1000, 10000)
+    database = make_file(tmp_path, "database.sqlite", 1000, 10000)
+    index.refresh()
+    assert index.evict(NOW) == (0, 0)
+    assert upload.exists() and database.exists()
+
+def test_refresh_skips_rescan_when_mtime_unchanged(tmp_path, index):
+    make_file(tmp_path, "rugImage-1.png", 10, 0)
+    index.refresh()
+    dir_stat = os.stat(tmp_path)
+    make_file(tmp_path, "rugImage-2.png", 10, 0)
+    os.utime(tmp_path, ns=(dir_stat.st_atime_ns, dir_stat.st_mtime_ns))
+    index.refresh()
+    assert index.stats()["upload"]["count"] == 1
+
+def test_refresh_picks_up_external_files(tmp_path, index):
+    index.refresh()
+    make_file(tmp_path, "rugImage-1.png", 10, 0)
+    bump_dir_mtime(tmp_path)
+    index.refresh()
+    assert index.stats()["upload"] == {"count": 1, "bytes": 10}
+
+def test_refresh_handles_add_and_delete_in_same_interval(tmp_path, index):
+    make_file(tmp_path, "database.sqlite", 100, 0)
+    journal = make_file(tmp_path, "database.sqlite-journal", 10, 0)
+    index.refresh()
+    journal.unlink()
+    make_file(tmp_path, "rugImage-1.png", 20, 0)
+    bump_dir_mtime(tmp_path)
+    index.refresh()
+    assert index.stats() == {
+        "other": {"count": 1, "bytes": 100},
+        "upload": {"count": 1, "bytes": 20},
+    }
+
+def test_refresh_restats_files_changed_in_place(tmp_path, index):
+    database = make_file(tmp_path, "database.sqlite", 100, 1)
+    index.refresh()
+    dir_stat = os.stat(tmp_path)
+    with open(database, "ab") as f:
+        f.write(b"x" * 50)
+    os.utime(tmp_path, ns=(dir_stat.st_atime_ns, dir_stat.st_mtime_ns))
+    index.refresh()
+    assert index.stats()["other"] == {"count": 1, "bytes": 150}
+
+def test_refresh_ignores_own_writes(tmp_path, index):
+    messages = []
+    sink = logger.add(messages.append, format="{message}")
+    try:
+        index.refresh()
+        index.add(make_file(tmp_path, "a.debug.jpg", 10, 0))
+        bump_dir_mtime(tmp_path)
+        index.refresh()
+    finally:
+        logger.remove(sink)
+    assert not any("Indexed" in message for message in messages)
+    assert index.stats() == {"debug": {"count": 1, "bytes": 10}}
+
+def test_stats_after_add_and_evict(tmp_path, index):
+    index.add(make_file(tmp_path, "a.debug.jpg", 10, 30))
+    index.add(make_file(tmp_path, "b.debug.jpg", 20, 1))
+    index.add(make_file(tmp_path, "rugImage-1.png", 5, 1))
+    assert index.stats() == {
+        "debug": {"count": 2, "bytes": 30},
+        "upload": {"count": 1, "bytes": 5},
+    }
+    index.evict(NOW)
+    assert index.stats() == {
+        "debug": {"count": 1, "bytes": 20},
+        "upload": {"count": 1, "bytes": 5},
+    }
@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+import pytest
+from recolour import RECOLOUR_CONFIG, build_label_map, recolour_image
+
+def square(segment_id, color, x0, y0, x1, y1):
+    points = [{"x": x0, "y": y0}, {"x": x1, "y": y0}, {"x": x1, "y": y1}, {"x": x0, "y": y1}]
+    return {"id": segment_id, "color": color, "mask": points}
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(777, 1031, 3), dtype=np.uint8)
+
+@pytest.fixture
+def segments():
+    return [
+        square(1, "#805020", 0.1, 0.1, 0.6, 0.7),
+        square(2, "#203080", 0.5, 0.4, 0.9, 0.9),
+    ]
+
+@pytest.mark.parametrize("quality", ["preview", "hi"])
+def test_output_keeps_input_shape(image, segments, quality):
+    result = recolour_image(image, segments, {1: "#10a040"}, quality)
+    assert result.shape == image.shape
+    assert result.dtype == np.uint8
+
+def test_hi_tiles_match_single_tile(image, segments, monkeypatch):
+    colors = {1: "#10a040", 2: "#ffcc00"}
+    tiled = recolour_image(image, segments, colors, "hi")
+    monkeypatch.setitem(RECOLOUR_CONFIG, "tile_size", 1152)
+    single = recolour_image(image, segments, colors, "hi")
+    np.testing.assert_array_equal(tiled, single)
+
+def test_preview_leaves_untargeted_pixels_unchanged(image, segments):
+    result = recolour_image(image, segments, {1: "#10a040"}, "preview")
+    labels = build_label_map(segments, image.shape)
+    unchanged = labels != 1
+    # Only LAB round-trip rounding is allowed outside the recoloured segment
+    diff = np.abs(result.astype(int) - image.astype(int))
+    assert diff[unchanged].max() <= 1
+    assert diff[labels == 1].max() > 1
+
+def test_hi_blends_only_near_segment_boundaries(image, segments):
+    colors = {1: "#10a040", 2: "#ffcc00"}
+    preview = recolour_image(image, segments, colors, "preview").astype(int)
+    hi = recolour_image(image, segments, colors, "hi").astype(int)
+
+    labels = build_label_map(segments, image.shape)
+    boundary = np.zeros(labels.shape, dtype=bool)
+    boundary[:, 1:] |= labels[:, 1:] != labels[:, :-1]
+    boundary[1:, :] |= labels[1:, :] != labels[:-1, :]
+    distance = cv2.distanceTransform((~boundary).astype(np.uint8), cv2.DIST_L2, 5)
+
+    # Far from boundaries the smoothed offset field is constant, so hi matches preview
+    # inside segments and in the untargeted background
+    band = 2 * 2 * (1 << RECOLOUR_CONFIG["pyramid_levels"])
+    diff = np.abs(hi - preview).max(axis=2)
+    assert diff[distance > band].max() <= 1
+    assert (labels[distance > band] == 0).any() and (labels[distance > band] == 1).any()
+    # ...while near boundaries the offsets are blended rather than stepped
+    assert diff[distance <= 2].mean() > 10
+
+def test_degenerate_polygons_are_skipped(image, segments):
+    segments.append({"id": 3, "color": "#000000", "mask": []})
+    labels = build_label_map(segments, image.shape)
+    assert not (labels == 3).any()